@@ -1,10 +1,45 @@
-import requests
+import httpx
 import urllib.parse
 import sys
 import time
-import random
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import soupsieve as sv
 from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lhtml
+
+# DuckDuckGo result selectors, compiled once instead of on every select call
+RESULT_SELECTOR = sv.compile('.result')
+RESULT_TITLE_SELECTOR = sv.compile('.result__title a')
+RESULT_SNIPPET_SELECTOR = sv.compile('.result__snippet')
+
+# First common content container in document order, matching any of
+# 'main', 'article', '.content', '#content', '.main', '.article', '.post'
+MAIN_CONTENT_XPATH = etree.XPath(
+    "(//main"
+    " | //article"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' content ')]"
+    " | //*[@id='content']"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' main ')]"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' article ')]"
+    " | //*[contains(concat(' ', normalize-space(@class), ' '), ' post ')])[1]"
+)
+
+# Minimum delay between requests to the same host, to avoid overloading websites
+HOST_DELAY = 0.75
+_host_last_request = defaultdict(float)
+_host_locks = defaultdict(Lock)
+
+# Shared HTTP/2 client so concurrent scrapes multiplex over pooled connections;
+# redirects are followed like requests did (e.g. DuckDuckGo ad links)
+CLIENT = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+    timeout=10.0,
+    follow_redirects=True,
+)
 
 def search_duckduckgo(query, num_results=10):
     """
@@ -33,17 +68,17 @@ def search_duckduckgo(query, num_results=10):
     
     try:
         # Send the request
-        response = requests.get(url, headers=headers)
+        response = CLIENT.get(url, headers=headers)
         response.raise_for_status()
         
-        # Parse the HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # httpx decodes with the header charset (or UTF-8), so bs4 runs no detection
+        soup = BeautifulSoup(response.text, 'lxml')
         
         # Extract search results
         results = []
-        for result in soup.select('.result')[:num_results]:
-            title_element = result.select_one('.result__title a')
-            snippet_element = result.select_one('.result__snippet')
+        for result in RESULT_SELECTOR.select(soup)[:num_results]:
+            title_element = RESULT_TITLE_SELECTOR.select_one(result)
+            snippet_element = RESULT_SNIPPET_SELECTOR.select_one(result)
             
             if title_element and snippet_element:
                 title = title_element.text.strip()
@@ -51,9 +86,10 @@ def search_duckduckgo(query, num_results=10):
                 url = title_element.get('href')
                 
                 if url and url.startswith('/'):
-                    url_params = urllib.parse.parse_qs(url.split('?')[1])
-                    if 'uddg' in url_params:
-                        url = url_params['uddg'][0]
+                    query_params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+                    target = query_params.get('uddg')
+                    if target:
+                        url = target
                 
                 results.append({
                     'title': title,
@@ -67,23 +103,17 @@ def search_duckduckgo(query, num_results=10):
         print(f"Error during search: {e}")
         return []
 
-def clean_url(url):
-    """Clean and normalize URLs from search results."""
-    # Handle ad URLs that start with duckduckgo.com/y.js
-    if url.startswith('https://duckduckgo.com/y.js?'):
-        try:
-            # Make a HEAD request to follow redirects
-            response = requests.head(url, allow_redirects=True, timeout=5)
-            return response.url
-        except:
-            return url
-    
-    return url
+def throttle_host(url):
+    """Wait until HOST_DELAY has passed since the last request to the URL's host."""
+    host = urllib.parse.urlsplit(url).netloc
+    with _host_locks[host]:
+        delay = HOST_DELAY - (time.monotonic() - _host_last_request[host])
+        if delay > 0:
+            time.sleep(delay)
+        _host_last_request[host] = time.monotonic()
 
-def scrape_website(url):
-    """Scrape content from a website URL."""
-    url = clean_url(url)
-    
+def scrape_website(url, max_paragraphs=50):
+    """Scrape up to max_paragraphs paragraphs of content from a website URL."""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -91,47 +121,49 @@ def scrape_website(url):
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        throttle_host(url)
+        
+        response = CLIENT.get(url, headers=headers)
         response.raise_for_status()
+        url = str(response.url)
         
-        # Use the content's detected encoding
-        soup = BeautifulSoup(response.content, 'html.parser', from_encoding=response.encoding)
+        # Decode with the charset from the Content-Type header when there is one;
+        # otherwise libxml2 relies on the document's own <meta charset> or BOM
+        charset = response.charset_encoding
+        parser = lhtml.HTMLParser(encoding=charset) if charset else None
+        root = lhtml.document_fromstring(response.content, parser=parser)
         
         # Get page title
-        title = soup.title.text.strip() if soup.title else "No title"
+        title = root.findtext('.//title')
+        title = title.strip() if title is not None else "No title"
         
         # Remove script and style tags
-        for script in soup(["script", "style"]):
-            script.extract()
-        
-        # Extract main content based on common content containers
-        main_content = None
-        for selector in ['main', 'article', '.content', '#content', '.main', '.article', '.post']:
-            main_content = soup.select_one(selector)
-            if main_content:
-                break
+        etree.strip_elements(root, 'script', 'style', with_tail=False)
         
-        # If no main content container found, use the body
-        if not main_content:
-            main_content = soup.body
+        # Extract main content based on common content containers,
+        # falling back to the body if none is found
+        matches = MAIN_CONTENT_XPATH(root)
+        main_content = matches[0] if matches else root.find('body')
         
         paragraphs = []
-        if main_content:
-            # Get all text paragraphs
-            for p in main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'li']):
-                text = p.get_text().strip()
+        if main_content is not None:
+            # Get all text paragraphs in a single XPath pass
+            for p in main_content.xpath('.//p|.//h1|.//h2|.//h3|.//h4|.//h5|.//li'):
+                text = p.text_content().strip()
                 if text:  # Any non-empty paragraph
                     paragraphs.append(text)
+                    if len(paragraphs) >= max_paragraphs:
+                        break
         
         # If we didn't get content, try a different approach
         if not paragraphs:
-            text = soup.get_text()
+            text = root.text_content()
             # Remove extra whitespace
             import re
             text = re.sub(r'\s+', ' ', text).strip()
             # Split into sentences
             sentences = re.split(r'(?<=[.!?])\s+', text)
-            paragraphs = [s for s in sentences if len(s) > 10]
+            paragraphs = [s for s in sentences if len(s) > 10][:max_paragraphs]
         
         return {
             "url": url,
@@ -178,20 +210,12 @@ def search_and_scrape(query, num_results=8, max_paragraphs=50):
     # Scrape websites using multithreading
     scraped_data = []
     with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_url = {executor.submit(scrape_website, result['url']): result for result in search_results}
+        future_to_url = {executor.submit(scrape_website, result['url'], max_paragraphs): result for result in search_results}
         for future in future_to_url:
             try:
                 site_data = future.result()
-                
-                # Limit number of paragraphs to avoid overwhelming amounts of data
-                if len(site_data['content']) > max_paragraphs:
-                    site_data['content'] = site_data['content'][:max_paragraphs]
-                
                 scraped_data.append(site_data)
                 print(f"Scraped: {site_data['url']}")
-                
-                # Sleep a bit to avoid overloading websites
-                time.sleep(random.uniform(0.5, 1))
             except Exception as e:
                 print(f"Error processing site: {e}")
     
@@ -240,8 +264,8 @@ if __name__ == "__main__":
     print_results(results)
     
     # You can also save the results to a file
-    import json
-    with open(f"{query.replace(' ', '_')}_results.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    import orjson
+    with open(f"{query.replace(' ', '_')}_results.json", "wb") as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
     
     print(f"\nResults saved to {query.replace(' ', '_')}_results.json")
\ No newline at end of file
@@ -1,18 +1,69 @@
 import asyncio
-import argparse
-import json
 import re
 import sys
-import os
+import pathlib
+import socket
 import urllib.parse
 import datetime
-from typing import Any, Dict, List, Optional, Tuple, Union, Set
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union, Set
 
 import aiohttp
-from bs4 import BeautifulSoup
+import orjson
+from aiohttp.resolver import AsyncResolver
+from selectolax.lexbor import LexborHTMLParser
 
 # Modified imports - replacing crawl4ai with Playwright directly
 from playwright.async_api import async_playwright
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+if TYPE_CHECKING:
+    import argparse
+
+# Patterns used to turn page titles into safe markdown filenames
+_SAFE_TITLE_STRIP = re.compile(r'[^\w\s-]')
+_SAFE_TITLE_DASH = re.compile(r'[-\s]+')
+
+# Transient network failures are retried with exponential backoff
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5  # seconds, doubled after each failed attempt
+
+# Navigation errors worth retrying (Chromium net:: and Firefox NS_ codes);
+# anything else, like DNS or certificate failures, fails on the first attempt
+_TRANSIENT_NAV_ERRORS = (
+    "net::ERR_CONNECTION_RESET",
+    "net::ERR_CONNECTION_CLOSED",
+    "net::ERR_CONNECTION_ABORTED",
+    "net::ERR_CONNECTION_REFUSED",
+    "net::ERR_CONNECTION_TIMED_OUT",
+    "net::ERR_TIMED_OUT",
+    "net::ERR_EMPTY_RESPONSE",
+    "net::ERR_NETWORK_CHANGED",
+    "NS_ERROR_NET_RESET",
+    "NS_ERROR_NET_INTERRUPT",
+    "NS_ERROR_NET_TIMEOUT",
+    "NS_ERROR_CONNECTION_REFUSED",
+)
+
+# Markdown table header separators, keyed by column count
+_SEP_CACHE: Dict[int, bytes] = {}
+
+# URL validation pattern - supports domains, subdomains with optional http(s)
+_URL_RE = re.compile(
+    r"^(?:https?://)?(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,}(?:/[^/\s]*)*$"
+)
+
+# Links to anchors, javascript, or mailto/tel targets are never crawled
+_SKIP_PREFIXES = ('#', 'javascript:', 'mailto:', 'tel:')
+
+# Common file extensions skipped to avoid downloading files
+_SKIP_EXTS = ('.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+              '.zip', '.rar', '.tar', '.gz', '.jpg', '.jpeg', '.png', '.gif',
+              '.mp3', '.mp4', '.avi', '.mov')
 
 # Define enums to replace crawl4ai enums
 from enum import Enum, auto
@@ -41,119 +92,178 @@ class CrawlerRunConfig:
 
 # Custom AsyncWebCrawler implementation to replace crawl4ai
 class AsyncWebCrawler:
-    def __init__(self, config=None):
+    """Lightweight crawler that opens a fresh context per URL on an already launched browser."""
+    
+    # Maximum characters of HTML / visible text copied out of the browser per page
+    MAX_HTML_CHARS = 200000
+    MAX_TEXT_CHARS = 100000
+    
+    # Resource types the scraper never needs; aborting them cuts bytes and page-ready time
+    _BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+    
+    # How long to wait for the load event after the DOM is ready, in milliseconds
+    LOAD_WAIT_MS = 3000
+    
+    # Markdown prefix for each heading level
+    _HEADING_PREFIXES = {f'h{level}': '#' * level + ' ' for level in range(1, 7)}
+    
+    _EXTRACT_SCRIPT = '''
+        ([maxHtml, maxText]) => {
+            const description = document.querySelector('meta[name="description"]') ||
+                                document.querySelector('meta[property="og:description"]');
+            const author = document.querySelector('meta[name="author"]');
+            return {
+                title: document.title,
+                description: description ? description.getAttribute('content') : '',
+                language: document.documentElement.lang || '',
+                author: author ? author.getAttribute('content') : '',
+                html: document.documentElement.outerHTML.slice(0, maxHtml),
+                text: document.body.innerText.slice(0, maxText),
+            };
+        }
+    '''
+    
+    def __init__(self, browser, config=None):
+        self.browser = browser
         self.config = config or BrowserConfig()
-        self.playwright = None
-        self.browser = None
-        
-    async def __aenter__(self):
-        self.playwright = await async_playwright().start()
-        browser_type = getattr(self.playwright, self.config.browser_type)
-        self.browser = await browser_type.launch(
-            headless=self.config.headless,
-            args=self.config.extra_args,
-            ignore_https_errors=self.config.ignore_https_errors
-        )
-        return self
     
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+    async def new_context(self):
+        """Open a new browser context with the configured options and heavy assets blocked."""
+        context = await self.browser.new_context(ignore_https_errors=self.config.ignore_https_errors)
+        await context.route("**/*", self._block_heavy_resources)
+        return context
     
-    async def arun(self, url, config=None):
+    def time_budget(self, config=None) -> float:
+        """Seconds a full arun may take: every goto attempt, the backoff between them and the load wait."""
+        config = config or CrawlerRunConfig()
+        backoff = sum(RETRY_BASE_DELAY * 2 ** attempt for attempt in range(RETRY_ATTEMPTS - 1))
+        return (config.page_timeout * RETRY_ATTEMPTS + self.LOAD_WAIT_MS) / 1000 + backoff
+    
+    @staticmethod
+    def _is_transient(error: PlaywrightError) -> bool:
+        """Whether a navigation error is worth retrying."""
+        if isinstance(error, PlaywrightTimeoutError):
+            return True
+        message = str(error)
+        return any(code in message for code in _TRANSIENT_NAV_ERRORS)
+    
+    async def _block_heavy_resources(self, route):
+        if route.request.resource_type in self._BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    async def arun(self, url, config=None, context=None):
         config = config or CrawlerRunConfig()
         result = type('Result', (), {})
         
-        context = await self.browser.new_context()
+        # Use the caller's context if given, otherwise a throwaway one for this URL
+        owns_context = context is None
+        if owns_context:
+            context = await self.new_context()
         page = await context.new_page()
         
         try:
-            await page.goto(url, timeout=config.page_timeout, wait_until="networkidle")
+            for attempt in range(RETRY_ATTEMPTS):
+                try:
+                    await page.goto(url, timeout=config.page_timeout, wait_until="domcontentloaded")
+                    break
+                except PlaywrightError as e:
+                    if attempt + 1 == RETRY_ATTEMPTS or not self._is_transient(e):
+                        raise
+                    await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt)
             
-            # Extract metadata
-            title = await page.title()
-            content = await page.content()
+            # Give the page a short window to finish loading, but don't block on it
+            try:
+                await page.wait_for_load_state("load", timeout=self.LOAD_WAIT_MS)
+            except PlaywrightTimeoutError:
+                pass
             
-            # Extract text content
-            text_content = await page.evaluate('() => document.body.innerText')
+            # Extract content and metadata in a single round-trip to the browser,
+            # truncating HTML and text there so only what we keep crosses the bridge
+            data = await page.evaluate(self._EXTRACT_SCRIPT, [self.MAX_HTML_CHARS, self.MAX_TEXT_CHARS])
             
             # Create a simple result object
-            result.html = content
-            result.plain_text = text_content
+            result.html = data["html"]
+            result.plain_text = data["text"]
+            
+            # Parse once; the tree is reused by the scraper's extractors
+            result.tree = LexborHTMLParser(data["html"])
             
             # Convert HTML to markdown (simplified)
-            result.markdown = self._html_to_markdown(content, title)
+            result.markdown = self._html_to_markdown(result.tree, data["title"])
             
             # Add metadata
             result.metadata = {
-                "title": title,
-                "description": await self._get_meta_description(page),
-                "language": await self._get_language(page),
-                "author": await self._get_author(page),
+                "title": data["title"],
+                "description": data["description"],
+                "language": data["language"],
+                "author": data["author"],
             }
             
             return result
         finally:
-            await context.close()
-    
-    async def _get_meta_description(self, page):
-        desc = await page.evaluate('''
-            () => {
-                const meta = document.querySelector('meta[name="description"]') || 
-                            document.querySelector('meta[property="og:description"]');
-                return meta ? meta.getAttribute('content') : '';
-            }
-        ''')
-        return desc
-    
-    async def _get_language(self, page):
-        lang = await page.evaluate('''
-            () => {
-                return document.documentElement.lang || '';
-            }
-        ''')
-        return lang
-    
-    async def _get_author(self, page):
-        author = await page.evaluate('''
-            () => {
-                const meta = document.querySelector('meta[name="author"]');
-                return meta ? meta.getAttribute('content') : '';
-            }
-        ''')
-        return author
+            await page.close()
+            if owns_context:
+                await context.close()
     
-    def _html_to_markdown(self, html, title):
-        """Very simple HTML to Markdown conversion"""
-        soup = BeautifulSoup(html, 'html.parser')
+    async def arun_many(self, urls, config=None, semaphore=None):
+        """Crawl several URLs in one shared browser context.
         
-        # Start with title
-        markdown = f"# {title}\n\n"
+        Pages share cookies and connection state, and the context is only set
+        up once. Each URL is bounded by time_budget(); failures are returned
+        as exceptions in the result list, in the same order as urls.
+        """
+        config = config or CrawlerRunConfig()
+        semaphore = semaphore or asyncio.Semaphore(len(urls) or 1)
+        context = await self.new_context()
         
-        # Extract paragraphs
-        for p in soup.find_all('p'):
-            text = p.get_text(strip=True)
-            if text:
-                markdown += f"{text}\n\n"
+        async def run_one(url):
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self.arun(url, config=config, context=context),
+                    timeout=self.time_budget(config),
+                )
         
-        # Extract headings
-        for i in range(1, 7):
-            for h in soup.find_all(f'h{i}'):
-                text = h.get_text(strip=True)
-                if text:
-                    markdown += f"{'#' * i} {text}\n\n"
+        try:
+            return await asyncio.gather(*(run_one(url) for url in urls), return_exceptions=True)
+        finally:
+            await context.close()
+    
+    def _html_to_markdown(self, tree, title):
+        """Very simple HTML to Markdown conversion of a parsed HTML tree, in one document-order pass"""
+        # Start with title
+        parts = [f"# {title}\n\n"]
+        if tree.body is None:
+            return parts[0]
         
-        # Extract lists
-        for ul in soup.find_all('ul'):
-            for li in ul.find_all('li'):
-                text = li.get_text(strip=True)
-                if text:
-                    markdown += f"* {text}\n"
-            markdown += "\n"
+        in_list = False
+        for node in tree.body.traverse(include_text=False):
+            tag = node.tag
+            if tag != 'p' and tag != 'li' and tag not in self._HEADING_PREFIXES:
+                continue
+            text = node.text(strip=True)
+            if not text:
+                continue
+            
+            # List items are kept together, with a blank line after the list
+            if tag == 'li':
+                parts.append(f"* {text}\n")
+                in_list = True
+                continue
+            if in_list:
+                parts.append("\n")
+                in_list = False
+            
+            if tag == 'p':
+                parts.append(f"{text}\n\n")
+            else:
+                parts.append(f"{self._HEADING_PREFIXES[tag]}{text}\n\n")
+        
+        if in_list:
+            parts.append("\n")
         
-        return markdown
+        return "".join(parts)
 
 
 class DuckDuckGoSearch:
@@ -169,10 +279,11 @@ class DuckDuckGoSearch:
             'Referer': 'https://duckduckgo.com/'
         }
     
-    async def search(self, query: str, num_results: int = 10) -> List[Dict[str, str]]:
+    async def search(self, session: aiohttp.ClientSession, query: str, num_results: int = 10) -> List[Dict[str, str]]:
         """Search DuckDuckGo for the given query.
         
         Args:
+            session: The shared HTTP session to send the request with
             query: The search query
             num_results: Maximum number of results to return
             
@@ -184,14 +295,22 @@ class DuckDuckGoSearch:
         
         print(f"Searching DuckDuckGo for: \"{query}\"")
         
-        async with aiohttp.ClientSession() as session:
+        for attempt in range(RETRY_ATTEMPTS):
             try:
-                async with session.get(url, headers=self.headers, timeout=15) as response:
+                async with session.get(url, headers=self.headers) as response:
                     response.raise_for_status()
                     html = await response.text()
                     results = self._parse_results(html, num_results)
                     print(f"Found {len(results)} results")
                     return results
+            except (aiohttp.ClientResponseError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Rate limiting and server errors are retried; other statuses (400/403/404) are final
+                transient = not isinstance(e, aiohttp.ClientResponseError) or e.status == 429 or e.status >= 500
+                if transient and attempt + 1 < RETRY_ATTEMPTS:
+                    await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+                    continue
+                print(f"DuckDuckGo search failed: {str(e)}")
+                return []
             except Exception as e:
                 print(f"DuckDuckGo search failed: {str(e)}")
                 return []
@@ -206,18 +325,18 @@ class DuckDuckGoSearch:
         Returns:
             List of search results with title, snippet, and URL
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        tree = LexborHTMLParser(html)
         results = []
         
-        for result in soup.select('.result')[:num_results]:
-            title_elem = result.select_one('.result__title a')
-            snippet_elem = result.select_one('.result__snippet')
+        for result in tree.css('.result')[:num_results]:
+            title_elem = result.css_first('.result__title a')
+            snippet_elem = result.css_first('.result__snippet')
             
-            if title_elem and snippet_elem:
-                url = self._extract_url(title_elem.get('href'))
+            if title_elem is not None and snippet_elem is not None:
+                url = self._extract_url(title_elem.attributes.get('href'))
                 results.append({
-                    'title': title_elem.text.strip(),
-                    'snippet': snippet_elem.text.strip(),
+                    'title': title_elem.text().strip(),
+                    'snippet': snippet_elem.text().strip(),
                     'url': url
                 })
         
@@ -250,7 +369,8 @@ class DeepWebScraper:
                  browser_type: str = "chromium",
                  headless: bool = True,
                  max_depth: int = 2,
-                 max_pages_per_domain: int = 5):
+                 max_pages_per_domain: int = 5,
+                 max_per_host: int = 3):
         """Initialize the web scraper with configurable options.
         
         Args:
@@ -259,10 +379,13 @@ class DeepWebScraper:
             headless: Whether to run the browser in headless mode
             max_depth: Maximum depth to crawl from initial URL
             max_pages_per_domain: Maximum number of pages to crawl per domain
+            max_per_host: Maximum number of pages fetched concurrently from one host
         """
         self.timeout = timeout
         self.max_depth = max_depth
         self.max_pages_per_domain = max_pages_per_domain
+        self.max_per_host = max_per_host
+        self._host_sem: Dict[str, asyncio.Semaphore] = {}
         self.browser_config = BrowserConfig(
             browser_type=browser_type,
             headless=headless,
@@ -274,6 +397,13 @@ class DeepWebScraper:
                 "--disable-dev-shm-usage",
             ],
         )
+        self.run_config = CrawlerRunConfig(
+            cache_mode=CacheMode.BYPASS,
+            verbose=False,
+            page_timeout=timeout * 1000,  # Convert to milliseconds
+        )
+        # Attached by DeepScraperService once its browser is launched
+        self.crawler = None
         
     def normalize_url(self, url: str) -> Tuple[bool, str]:
         """Validate and normalize a URL.
@@ -284,12 +414,7 @@ class DeepWebScraper:
         Returns:
             A tuple of (is_valid, normalized_url)
         """
-        # URL validation pattern - supports domains, subdomains with optional http(s)
-        url_pattern = re.compile(
-            r"^(?:https?://)?(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+[A-Za-z]{2,}(?:/[^/\s]*)*$"
-        )
-        
-        if not url_pattern.match(url):
+        if not _URL_RE.match(url):
             return False, url
             
         # Add https:// if missing
@@ -298,10 +423,27 @@ class DeepWebScraper:
             
         return True, url
     
-    def get_domain(self, url: str) -> str:
-        """Extract the domain from a URL."""
-        parsed_url = urllib.parse.urlparse(url)
-        return parsed_url.netloc
+    @staticmethod
+    @lru_cache(maxsize=100000)
+    def get_domain(url: str) -> str:
+        """Extract the domain from a URL (memoized, links repeat heavily during a crawl)."""
+        return urllib.parse.urlsplit(url).netloc
+    
+    def _require_crawler(self) -> AsyncWebCrawler:
+        """Return the attached crawler, failing clearly if there is none."""
+        if self.crawler is None:
+            raise RuntimeError(
+                "DeepWebScraper has no crawler attached; use it through "
+                "'async with DeepScraperService(...)'"
+            )
+        return self.crawler
+    
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        """Return the semaphore capping concurrent page fetches for a host."""
+        semaphore = self._host_sem.get(host)
+        if semaphore is None:
+            semaphore = self._host_sem[host] = asyncio.Semaphore(self.max_per_host)
+        return semaphore
     
     def is_same_domain(self, url1: str, url2: str) -> bool:
         """Check if two URLs belong to the same domain."""
@@ -311,8 +453,7 @@ class DeepWebScraper:
         """Convert relative URLs to absolute and filter out unwanted URL types."""
         try:
             # Skip URLs that are anchors, javascript, or mailto links
-            if not href or href.startswith('#') or href.startswith('javascript:') or \
-               href.startswith('mailto:') or href.startswith('tel:'):
+            if not href or href.startswith(_SKIP_PREFIXES):
                 return None
                 
             # Create absolute URL if href is relative
@@ -323,30 +464,27 @@ class DeepWebScraper:
                 return None
                 
             # Skip URLs with common file extensions to avoid downloading files
-            file_extensions = ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', 
-                              '.zip', '.rar', '.tar', '.gz', '.jpg', '.jpeg', '.png', '.gif', 
-                              '.mp3', '.mp4', '.avi', '.mov']
-            if any(absolute_url.lower().endswith(ext) for ext in file_extensions):
+            if absolute_url.lower().endswith(_SKIP_EXTS):
                 return None
                 
             return absolute_url
         except Exception:
             return None
     
-    async def extract_links(self, html: str, base_url: str) -> List[str]:
-        """Extract all valid links from HTML content."""
-        soup = BeautifulSoup(html, 'html.parser')
-        links = []
+    async def extract_links(self, tree: LexborHTMLParser, base_url: str) -> List[str]:
+        """Extract all unique same-domain links from a parsed HTML tree."""
+        base_netloc = urllib.parse.urlsplit(base_url).netloc
+        links = set()
         
-        for anchor in soup.find_all('a', href=True):
-            normalized_url = self.normalize_internal_url(base_url, anchor['href'])
-            if normalized_url and self.is_same_domain(base_url, normalized_url):
-                links.append(normalized_url)
+        for anchor in tree.css('a[href]'):
+            normalized_url = self.normalize_internal_url(base_url, anchor.attributes['href'])
+            if normalized_url and urllib.parse.urlsplit(normalized_url).netloc == base_netloc:
+                links.add(normalized_url)
                 
-        return list(set(links))  # Remove duplicates
+        return list(links)
     
-    async def extract_structured_data(self, html: str) -> Dict[str, Any]:
-        """Extract structured data like JSON-LD, microdata, and metadata from HTML."""
+    async def extract_structured_data(self, tree: LexborHTMLParser) -> Dict[str, Any]:
+        """Extract structured data like JSON-LD, microdata, and metadata from a parsed HTML tree."""
         structured_data = {
             "json_ld": [],
             "meta_tags": {},
@@ -354,59 +492,56 @@ class DeepWebScraper:
             "twitter_cards": {},
         }
         
-        soup = BeautifulSoup(html, 'html.parser')
-        
         # Extract JSON-LD
-        for script in soup.find_all('script', type='application/ld+json'):
+        for script in tree.css('script[type="application/ld+json"]'):
             try:
-                json_data = json.loads(script.string)
+                json_data = orjson.loads(script.text())
                 structured_data["json_ld"].append(json_data)
-            except (json.JSONDecodeError, TypeError):
+            except (orjson.JSONDecodeError, TypeError):
                 pass
         
         # Extract meta tags
-        for meta in soup.find_all('meta'):
-            if meta.get('name') and meta.get('content'):
-                structured_data["meta_tags"][meta['name']] = meta['content']
-            elif meta.get('property') and meta.get('content'):
-                if meta['property'].startswith('og:'):
-                    # OpenGraph tags
-                    structured_data["open_graph"][meta['property'][3:]] = meta['content']
-                elif meta['property'].startswith('twitter:'):
-                    # Twitter card tags
-                    structured_data["twitter_cards"][meta['property'][8:]] = meta['content']
+        meta_tags = structured_data["meta_tags"]
+        open_graph = structured_data["open_graph"]
+        twitter_cards = structured_data["twitter_cards"]
+        for meta in tree.css('meta'):
+            # Read the attribute dict once per tag
+            attrs = meta.attributes
+            content = attrs.get('content')
+            if not content:
+                continue
+            name = attrs.get('name')
+            if name:
+                meta_tags[name] = content
+                continue
+            prop = attrs.get('property')
+            if not prop:
+                continue
+            if prop.startswith('og:'):
+                # OpenGraph tags
+                open_graph[prop[3:]] = content
+            elif prop.startswith('twitter:'):
+                # Twitter card tags
+                twitter_cards[prop[8:]] = content
         
         return structured_data
     
-    async def extract_tables(self, html: str) -> List[Dict[str, Any]]:
-        """Extract tables from HTML content."""
-        soup = BeautifulSoup(html, 'html.parser')
+    async def extract_tables(self, tree: LexborHTMLParser) -> List[Dict[str, Any]]:
+        """Extract tables from a parsed HTML tree."""
         tables = []
         
-        for table_idx, table in enumerate(soup.find_all('table')):
-            table_data = {"id": table_idx, "caption": "", "headers": [], "rows": []}
-            
-            # Extract caption if present
-            caption = table.find('caption')
-            if caption:
-                table_data["caption"] = caption.get_text(strip=True)
-            
-            # Extract headers
-            headers = []
-            header_row = table.find('tr')
-            if header_row:
-                for th in header_row.find_all(['th', 'td']):
-                    headers.append(th.get_text(strip=True))
-                table_data["headers"] = headers
-            
-            # Extract rows
-            for row in table.find_all('tr')[1:] if headers else table.find_all('tr'):
-                row_data = []
-                for cell in row.find_all(['td', 'th']):
-                    row_data.append(cell.get_text(strip=True))
-                table_data["rows"].append(row_data)
+        for table_idx, table in enumerate(tree.css('table')):
+            caption = table.css_first('caption')
+            rows = [[cell.text(strip=True) for cell in row.css('th, td')] for row in table.css('tr')]
             
-            tables.append(table_data)
+            # The first row is treated as the header row
+            headers = rows[0] if rows else []
+            tables.append({
+                "id": table_idx,
+                "caption": caption.text(strip=True) if caption is not None else "",
+                "headers": headers,
+                "rows": rows[1:] if headers else rows,
+            })
         
         return tables
     
@@ -414,7 +549,8 @@ class DeepWebScraper:
                          url: str, 
                          extract_metadata: bool = True,
                          extract_structured: bool = True,
-                         extract_tables: bool = True) -> Dict[str, Any]:
+                         extract_tables: bool = True,
+                         keep_html: bool = False) -> Dict[str, Any]:
         """Scrape a webpage using Playwright with enhanced extraction.
         
         Args:
@@ -422,6 +558,7 @@ class DeepWebScraper:
             extract_metadata: Whether to extract metadata from the page
             extract_structured: Whether to extract structured data
             extract_tables: Whether to extract tables
+            keep_html: Whether to keep the (truncated) page HTML in the result
             
         Returns:
             Dictionary with the scraping results
@@ -436,84 +573,108 @@ class DeepWebScraper:
                 "error": "Invalid URL format"
             }
         
+        crawler = self._require_crawler()
         print(f"Scraping: {normalized_url}")
         
         try:
-            # Configure settings
-            run_config = CrawlerRunConfig(
-                cache_mode=CacheMode.BYPASS,
-                verbose=False,
-                page_timeout=self.timeout * 1000,  # Convert to milliseconds
+            # Use the shared AsyncWebCrawler for the actual scraping
+            result = await asyncio.wait_for(
+                crawler.arun(
+                    url=normalized_url,
+                    config=self.run_config,
+                ),
+                timeout=crawler.time_budget(self.run_config),
             )
             
-            # Use AsyncWebCrawler for the actual scraping
-            async with AsyncWebCrawler(config=self.browser_config) as crawler:
-                result = await asyncio.wait_for(
-                    crawler.arun(
-                        url=normalized_url,
-                        config=run_config,
-                    ),
-                    timeout=self.timeout,
-                )
-                
-                # Extract content from the result
-                response_data = {
-                    "success": True,
-                    "url": normalized_url,
-                    "title": "",  # Will be populated later
-                    "markdown": getattr(result, "markdown", ""),
-                    "plain_text": getattr(result, "plain_text", ""),
-                    "html": getattr(result, "html", "")[:20000] if hasattr(result, "html") else "",  # Limit HTML size
+            return await self._build_response(
+                normalized_url,
+                result,
+                extract_metadata=extract_metadata,
+                extract_structured=extract_structured,
+                extract_tables=extract_tables,
+                keep_html=keep_html,
+            )
+            
+        except Exception as e:
+            return self._error_response(normalized_url, e)
+    
+    async def _build_response(self,
+                              url: str,
+                              result: Any,
+                              extract_metadata: bool = True,
+                              extract_structured: bool = True,
+                              extract_tables: bool = True,
+                              keep_html: bool = False) -> Dict[str, Any]:
+        """Turn a crawler result into the scraping response dictionary."""
+        html = getattr(result, "html", "")
+        
+        # Extract content from the result
+        response_data = {
+            "success": True,
+            "url": url,
+            "title": "",  # Will be populated later
+            "markdown": getattr(result, "markdown", ""),
+            "plain_text": getattr(result, "plain_text", ""),
+        }
+        
+        # Only copy the HTML out when the caller keeps it
+        if keep_html:
+            response_data["html"] = html[:20000]  # Limit HTML size
+        
+        # Share the crawler's parsed tree between extractors, parsing only if it has none
+        tree = getattr(result, "tree", None)
+        if tree is None:
+            tree = LexborHTMLParser(html)
+        
+        # Extract links for deep crawling
+        response_data["links"] = await self.extract_links(tree, url)
+        
+        # Add metadata if requested and available
+        if extract_metadata and hasattr(result, "metadata") and result.metadata:
+            # Handle both object and dictionary metadata formats
+            if isinstance(result.metadata, dict):
+                response_data["title"] = result.metadata.get("title", "")
+                response_data["metadata"] = {
+                    "title": result.metadata.get("title", ""),
+                    "description": result.metadata.get("description", ""),
+                    "language": result.metadata.get("language", ""),
+                    "author": result.metadata.get("author", ""),
                 }
-                
-                # Extract links for deep crawling
-                response_data["links"] = await self.extract_links(response_data["html"], normalized_url)
-                
-                # Add metadata if requested and available
-                if extract_metadata and hasattr(result, "metadata") and result.metadata:
-                    # Handle both object and dictionary metadata formats
-                    if isinstance(result.metadata, dict):
-                        response_data["title"] = result.metadata.get("title", "")
-                        response_data["metadata"] = {
-                            "title": result.metadata.get("title", ""),
-                            "description": result.metadata.get("description", ""),
-                            "language": result.metadata.get("language", ""),
-                            "author": result.metadata.get("author", ""),
-                        }
-                    else:
-                        response_data["title"] = getattr(result.metadata, "title", "")
-                        response_data["metadata"] = {
-                            "title": getattr(result.metadata, "title", ""),
-                            "description": getattr(result.metadata, "description", ""),
-                            "language": getattr(result.metadata, "language", ""),
-                            "author": getattr(result.metadata, "author", ""),
-                        }
-                
-                # Extract structured data if requested
-                if extract_structured and response_data["html"]:
-                    response_data["structured_data"] = await self.extract_structured_data(response_data["html"])
-                
-                # Extract tables if requested
-                if extract_tables and response_data["html"]:
-                    response_data["tables"] = await self.extract_tables(response_data["html"])
-                
-                print(f"Successfully scraped: {normalized_url}")
-                return response_data
-                
-        except asyncio.TimeoutError:
-            print(f"Timeout while scraping: {normalized_url}")
+            else:
+                response_data["title"] = getattr(result.metadata, "title", "")
+                response_data["metadata"] = {
+                    "title": getattr(result.metadata, "title", ""),
+                    "description": getattr(result.metadata, "description", ""),
+                    "language": getattr(result.metadata, "language", ""),
+                    "author": getattr(result.metadata, "author", ""),
+                }
+        
+        # Extract structured data if requested
+        if extract_structured and html:
+            response_data["structured_data"] = await self.extract_structured_data(tree)
+        
+        # Extract tables if requested
+        if extract_tables and html:
+            response_data["tables"] = await self.extract_tables(tree)
+        
+        print(f"Successfully scraped: {url}")
+        return response_data
+    
+    def _error_response(self, url: str, error: Exception) -> Dict[str, Any]:
+        """Build the failure response for a URL that could not be scraped."""
+        if isinstance(error, asyncio.TimeoutError):
+            print(f"Timeout while scraping: {url}")
             return {
                 "success": False,
-                "url": normalized_url,
-                "error": f"Operation timed out after {self.timeout} seconds"
-            }
-        except Exception as e:
-            print(f"Error scraping {normalized_url}: {str(e)}")
-            return {
-                "success": False, 
-                "url": normalized_url,
-                "error": str(e)
+                "url": url,
+                "error": f"Operation timed out after {RETRY_ATTEMPTS} attempts of {self.timeout} seconds"
             }
+        print(f"Error scraping {url}: {str(error)}")
+        return {
+            "success": False, 
+            "url": url,
+            "error": str(error)
+        }
     
     async def deep_crawl(self, start_url: str) -> Dict[str, Any]:
         """Perform deep crawling starting from the given URL.
@@ -533,14 +694,18 @@ class DeepWebScraper:
                 "error": "Invalid URL format"
             }
         
+        crawler = self._require_crawler()
         domain = self.get_domain(normalized_url)
         print(f"Starting deep crawl on domain: {domain}")
         
         # Track visited URLs and pages to crawl
         visited_urls = set()
-        urls_to_crawl = [(normalized_url, 0)]  # (url, depth)
+        urls_to_crawl = deque([(normalized_url, 0)])  # (url, depth)
         domain_page_count = 0
         
+        # Shared with any other crawl of the same host
+        semaphore = self._host_semaphore(domain)
+        
         all_results = {
             "success": True,
             "start_url": normalized_url,
@@ -549,18 +714,39 @@ class DeepWebScraper:
         }
         
         while urls_to_crawl and domain_page_count < self.max_pages_per_domain:
-            current_url, depth = urls_to_crawl.pop(0)
+            # Take a batch of unvisited URLs from the current depth layer,
+            # no larger than the remaining page budget
+            depth = urls_to_crawl[0][1]
+            batch = []
+            while urls_to_crawl and urls_to_crawl[0][1] == depth and \
+                  len(batch) < self.max_pages_per_domain - domain_page_count:
+                current_url, _ = urls_to_crawl.popleft()
+                if current_url in visited_urls:
+                    continue
+                visited_urls.add(current_url)
+                batch.append(current_url)
             
-            if current_url in visited_urls:
+            if not batch:
                 continue
-                
-            visited_urls.add(current_url)
             
-            # Scrape the current URL
-            print(f"Crawling [{depth}/{self.max_depth}]: {current_url}")
-            result = await self.scrape_url(current_url)
+            # Scrape the batch concurrently in one shared browser context
+            for current_url in batch:
+                print(f"Crawling [{depth}/{self.max_depth}]: {current_url}")
+            fetched = await crawler.arun_many(batch, config=self.run_config, semaphore=semaphore)
             
-            if result["success"]:
+            for current_url, page_result in zip(batch, fetched):
+                if isinstance(page_result, Exception):
+                    result = self._error_response(current_url, page_result)
+                else:
+                    # A failed extraction only drops this page, not the whole domain
+                    try:
+                        result = await self._build_response(current_url, page_result, keep_html=False)
+                    except Exception as e:
+                        result = self._error_response(current_url, e)
+                
+                if not result["success"]:
+                    continue
+                
                 domain_page_count += 1
                 all_results["pages"].append(result)
                 
@@ -584,6 +770,59 @@ class DeepScraperService:
     def __init__(self, max_depth: int = 2, max_pages_per_domain: int = 5):
         self.scraper = DeepWebScraper(max_depth=max_depth, max_pages_per_domain=max_pages_per_domain)
         self.search_engine = DuckDuckGoSearch()
+        self._session = None
+        self._playwright = None
+        self._browser = None
+    
+    async def __aenter__(self):
+        # One pooled session for the service lifetime so requests reuse connections
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                resolver=self._make_resolver(),
+                use_dns_cache=True,
+                ttl_dns_cache=300,
+                limit=20,
+                keepalive_timeout=30,
+                family=socket.AF_INET,
+            ),
+            timeout=aiohttp.ClientTimeout(total=15),
+        )
+        
+        # Launch the browser once; each scraped URL only opens a new context
+        browser_config = self.scraper.browser_config
+        try:
+            self._playwright = await async_playwright().start()
+            browser_type = getattr(self._playwright, browser_config.browser_type)
+            self._browser = await browser_type.launch(
+                headless=browser_config.headless,
+                args=browser_config.extra_args,
+            )
+        except BaseException:
+            # __aexit__ is not called when __aenter__ fails, so release what was opened
+            await self.__aexit__(None, None, None)
+            raise
+        self.scraper.crawler = AsyncWebCrawler(self._browser, config=browser_config)
+        return self
+    
+    @staticmethod
+    def _make_resolver():
+        """Resolve DNS asynchronously when aiodns is installed, else use aiohttp's default."""
+        try:
+            return AsyncResolver()
+        except RuntimeError:
+            return None
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.scraper.crawler = None
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        if self._session:
+            await self._session.close()
+            self._session = None
     
     async def search_and_deep_scrape(self, 
                                     query: str, 
@@ -599,8 +838,13 @@ class DeepScraperService:
         Returns:
             Dictionary with search results and deeply scraped content
         """
+        # Fail clearly outside 'async with', before bounded() would turn it into error entries
+        if self._session is None:
+            raise RuntimeError("DeepScraperService is not started; use 'async with DeepScraperService(...)'")
+        self.scraper._require_crawler()
+        
         # First, search for the query
-        search_results = await self.search_engine.search(query, num_results)
+        search_results = await self.search_engine.search(self._session, query, num_results)
         
         if not search_results:
             return {
@@ -617,26 +861,37 @@ class DeepScraperService:
         # Deep scrape each URL
         print(f"Deep scraping {len(urls)} domains...")
         
+        # Bound how many domains are scraped at once
+        semaphore = asyncio.Semaphore(10)
+        
+        async def bounded(index, coro):
+            # Tag each result with its position and turn failures into error entries
+            async with semaphore:
+                try:
+                    return index, await coro
+                except Exception as e:
+                    return index, {
+                        "success": False,
+                        "url": urls[index],
+                        "error": str(e)
+                    }
+        
         if perform_deep_crawl:
             # For deep crawling, process each domain
-            scrape_tasks = [self.scraper.deep_crawl(url) for url in urls]
+            scrape_tasks = [bounded(i, self.scraper.deep_crawl(url)) for i, url in enumerate(urls)]
         else:
             # For simple scraping, just get the main page
-            scrape_tasks = [self.scraper.scrape_url(url, extract_structured=True, extract_tables=True) for url in urls]
-            
-        scraped_results = await asyncio.gather(*scrape_tasks, return_exceptions=True)
-        
-        # Process results, handling any exceptions
-        processed_results = []
-        for i, result in enumerate(scraped_results):
-            if isinstance(result, Exception):
-                processed_results.append({
-                    "success": False,
-                    "url": urls[i],
-                    "error": str(result)
-                })
-            else:
-                processed_results.append(result)
+            scrape_tasks = [
+                bounded(i, self.scraper.scrape_url(url, extract_structured=True, extract_tables=True))
+                for i, url in enumerate(urls)
+            ]
+        
+        # Collect results as each domain finishes, keeping them in search-result order
+        processed_results = [None] * len(urls)
+        for completed, future in enumerate(asyncio.as_completed(scrape_tasks), 1):
+            index, result = await future
+            processed_results[index] = result
+            print(f"Finished domain {completed}/{len(urls)}: {urls[index]}")
         
         # Count successful scrapes
         successful = sum(1 for result in processed_results if result.get("success", False))
@@ -676,6 +931,7 @@ class DeepScraperService:
         }
         
         # Analyze each domain
+        summary = analysis["summary"]
         all_text = []
         for domain_result in results["scraped_content"]:
             if not domain_result.get("success", False):
@@ -687,8 +943,10 @@ class DeepScraperService:
                 # Fallback if both domain and url are missing
                 domain = "unknown_domain"
                 
-            domain_pages = domain_result.get("pages", [domain_result])
-            analysis["summary"]["total_pages"] += len(domain_pages)
+            domain_pages = domain_result.get("pages")
+            if domain_pages is None:
+                domain_pages = (domain_result,)
+            summary["total_pages"] += len(domain_pages)
             
             domain_insight = {
                 "domain": domain,
@@ -699,18 +957,21 @@ class DeepScraperService:
             
             # Collect text and analyze pages
             for page in domain_pages:
-                all_text.append(page.get("plain_text", ""))
+                get = page.get
+                all_text.append(get("plain_text", ""))
                 
                 # Count tables
-                if page.get("tables"):
-                    tables_count = len(page["tables"])
+                tables = get("tables")
+                if tables:
+                    tables_count = len(tables)
                     domain_insight["tables_found"] += tables_count
-                    analysis["summary"]["tables_found"] += tables_count
+                    summary["tables_found"] += tables_count
                 
                 # Check for structured data
-                if page.get("structured_data") and any(page["structured_data"].values()):
+                structured_data = get("structured_data")
+                if structured_data and any(structured_data.values()):
                     domain_insight["has_structured_data"] = True
-                    analysis["summary"]["structured_data_found"] += 1
+                    summary["structured_data_found"] += 1
             
             analysis["domain_insights"].append(domain_insight)
         
@@ -725,6 +986,151 @@ class DeepScraperService:
         return analysis
 
 
+class JsonArrayWriter:
+    """Write a compact JSON array to a binary file one element at a time."""
+    
+    def __init__(self, f, option: int = 0):
+        self._f = f
+        self._option = option
+        self._first = True
+        f.write(b'[')
+    
+    def append(self, obj: Any) -> None:
+        if not self._first:
+            self._f.write(b',')
+        self._first = False
+        self._f.write(orjson.dumps(obj, option=self._option))
+    
+    def close(self) -> None:
+        self._f.write(b']')
+
+
+def _dump_json(obj: Dict[str, Any], path: str, pretty: bool = False) -> None:
+    """Serialize a results dict to path as UTF-8 JSON.
+    
+    Compact output streams top-level lists (search results, scraped domains)
+    one element at a time, so only one domain's encoding is held at once.
+    Indented output is encoded in a single call so nesting stays correct.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    with open(path, 'wb') as f:
+        if pretty:
+            f.write(orjson.dumps(obj, option=option | orjson.OPT_INDENT_2))
+            return
+        f.write(b'{')
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                f.write(b',')
+            f.write(orjson.dumps(str(key)) + b':')
+            if isinstance(value, list):
+                writer = JsonArrayWriter(f, option)
+                for item in value:
+                    writer.append(item)
+                writer.close()
+            else:
+                f.write(orjson.dumps(value, option=option))
+        f.write(b'}')
+
+
+def _sep(n: int) -> bytes:
+    """Return the markdown header separator row for an n-column table."""
+    s = _SEP_CACHE.get(n)
+    if s is None:
+        s = _SEP_CACHE[n] = b"| " + b" | ".join([b"---"] * n) + b" |\n"
+    return s
+
+
+def _render_page_md(page: Dict[str, Any]) -> bytes:
+    """Render a scraped page as a UTF-8 encoded markdown document.
+    
+    Encoded fragments are appended to one bytearray as they are produced,
+    so there is no intermediate list of strings to join and encode.
+    """
+    get = page.get
+    
+    # Add a header with metadata
+    buf = bytearray(b"# ")
+    buf += str(get('title', 'Untitled')).encode('utf-8')
+    buf += b"\n\nURL: "
+    buf += str(get('url')).encode('utf-8')
+    buf += b"\n\n"
+    
+    metadata = get("metadata")
+    if metadata:
+        buf += f"Description: {metadata.get('description', '')}\n\n".encode('utf-8')
+        
+    # Add table data if available
+    tables = get("tables")
+    if tables:
+        buf += b"## Tables Found (%d)\n\n" % len(tables)
+        for table in tables:
+            if table.get("caption"):
+                buf += f"### {table['caption']}\n\n".encode('utf-8')
+            else:
+                buf += b"### Table %d\n\n" % (table['id'] + 1)
+                
+            # Create markdown table
+            if table["headers"]:
+                buf += ("| %s |\n" % " | ".join(table["headers"])).encode('utf-8')
+                buf += _sep(len(table["headers"]))
+                
+            for row in table["rows"]:
+                buf += ("| %s |\n" % " | ".join(row)).encode('utf-8')
+            
+            buf += b"\n"
+    
+    buf += b"---\n\n"
+    # Add the markdown content
+    buf += page["markdown"].encode('utf-8')
+    
+    return bytes(buf)
+
+
+def _write_files(batch: List[Tuple[Union[str, pathlib.Path], bytes]]) -> None:
+    """Write each (path, data) pair of a batch to disk."""
+    for path, data in batch:
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def _write_batch(batch: List[Tuple[Union[str, pathlib.Path], bytes]], workers: int = 16) -> None:
+    """Write a batch of pre-rendered files from a few worker threads.
+    
+    The batch is split into at most `workers` chunks and each chunk is handed
+    to a thread in one submission, instead of a thread hop per open/write/close.
+    """
+    chunk_size = max(1, -(-len(batch) // workers))
+    chunks = [batch[i:i + chunk_size] for i in range(0, len(batch), chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Consume the iterator so worker exceptions are raised here
+        list(pool.map(_write_files, chunks))
+
+
+def _write_tar(path: Union[str, pathlib.Path], files: List[Tuple[str, bytes]]) -> None:
+    """Write pre-rendered (name, data) pairs as entries of one uncompressed tar."""
+    import tarfile
+    
+    mtime = int(datetime.datetime.now().timestamp())
+    with tarfile.open(path, 'w') as tf:
+        for name, data in files:
+            info = tarfile.TarInfo(name=name)
+            info.size = len(data)
+            info.mtime = mtime
+            tf.addfile(info, io.BytesIO(data))
+
+
+def format_analysis_summary(analysis: Dict[str, Any]) -> str:
+    """Format the totals of an analysis as a printable block of text."""
+    s = analysis["summary"]
+    return (
+        "\n--- Deep Scrape Analysis ---\n"
+        f"Total domains scraped: {s['successful_domains']}/{s['total_domains']}\n"
+        f"Total pages crawled: {s['total_pages']}\n"
+        f"Tables found: {s['tables_found']}\n"
+        f"Pages with structured data: {s['structured_data_found']}\n"
+    )
+
+
 # Interactive mode function (missing in original)
 async def interactive_deep_search():
     """Run the deep scraper in interactive mode."""
@@ -735,57 +1141,192 @@ async def interactive_deep_search():
     depth = int(input("Enter crawl depth (1-3, default: 2): ") or "2")
     max_pages = int(input("Enter max pages per domain (1-10, default: 5): ") or "5")
     
-    service = DeepScraperService(max_depth=depth, max_pages_per_domain=max_pages)
-    
-    while True:
-        print("\n")
-        query = input("Enter search query (or 'exit' to quit): ")
-        if query.lower() in ('exit', 'quit', 'q'):
-            break
-            
-        num_results = int(input("Number of domains to scrape (1-5, default: 3): ") or "3")
-        deep_crawl = input("Perform deep crawling? (y/n, default: y): ").lower() != 'n'
+    async with DeepScraperService(max_depth=depth, max_pages_per_domain=max_pages) as service:
         
-        print(f"\nSearching for '{query}' and scraping top {num_results} results...")
+        while True:
+            print("\n")
+            query = input("Enter search query (or 'exit' to quit): ")
+            if query.lower() in ('exit', 'quit', 'q'):
+                break
+                
+            num_results = int(input("Number of domains to scrape (1-5, default: 3): ") or "3")
+            deep_crawl = input("Perform deep crawling? (y/n, default: y): ").lower() != 'n'
+            
+            print(f"\nSearching for '{query}' and scraping top {num_results} results...")
+            results = await service.search_and_deep_scrape(
+                query,
+                num_results=num_results,
+                perform_deep_crawl=deep_crawl
+            )
+            
+            # Print summary
+            print("\n--- Search Results ---")
+            if results["success"]:
+                for i, result in enumerate(results["search_results"], 1):
+                    title, url, snippet = result['title'], result['url'], result['snippet']
+                    print(f"{i}. {title}\n   URL: {url}\n   Snippet: {snippet}\n")
+                    
+                # Add analysis to results
+                analysis = await service.analyze_deep_scrape_results(results)
+                
+                # Print analysis summary
+                sys.stdout.write(format_analysis_summary(analysis))
+                
+                # Save option
+                save = input("\nSave results to file? (y/n, default: n): ").lower() == 'y'
+                if save:
+                    filename = input("Enter filename (without extension): ") or f"search_{int(datetime.datetime.now().timestamp())}"
+                    if not filename.endswith('.json'):
+                        filename += '.json'
+                    _dump_json(results, filename)
+                    print(f"Results saved to {filename}")
+            else:
+                print(f"Search failed: {results.get('error', 'Unknown error')}")
+
+
+async def _run_query(args: "argparse.Namespace") -> Dict[str, Any]:
+    """Search and deep scrape args.query, attaching the analysis on success."""
+    async with DeepScraperService(max_depth=args.depth, max_pages_per_domain=args.max_pages) as service:
         results = await service.search_and_deep_scrape(
-            query,
-            num_results=num_results,
-            perform_deep_crawl=deep_crawl
+            args.query, 
+            num_results=args.domains,
+            perform_deep_crawl=not args.no_deep_crawl
         )
         
-        # Print summary
-        print("\n--- Search Results ---")
+        # Add analysis to results
         if results["success"]:
-            for i, result in enumerate(results["search_results"]):
-                print(f"{i+1}. {result['title']}")
-                print(f"   URL: {result['url']}")
-                print(f"   Snippet: {result['snippet']}")
-                print()
+            results["analysis"] = await service.analyze_deep_scrape_results(results)
+    
+    return results
+
+
+def _render_summary(args: "argparse.Namespace", results: Dict[str, Any]) -> None:
+    """Print the search results and analysis summary for a command line query.
+    
+    The summary is collected in a buffer and written to stdout in one call.
+    """
+    out = io.StringIO()
+    out.write("\n--- Search Results Summary ---\n")
+    if results["success"]:
+        sc = results["scraped_content"]
+        nd = args.no_deep_crawl
+        for i, result in enumerate(results["search_results"]):
+            domain = DeepWebScraper.get_domain(result['url'])
+            scraped = sc[i] if i < len(sc) else None
+            scrape_status = "✓" if scraped and scraped["success"] else "✗"
+            
+            out.write(f"{i+1}. [{scrape_status}] {result['title']} ({domain})\n")
+            out.write(f"   URL: {result['url']}\n")
+            
+            # Show stats if available
+            if scraped and scraped.get("success"):
+                if not nd:
+                    pages_count = len(scraped.get("pages", []))
+                    out.write(f"   Pages crawled: {pages_count}\n")
+                else:
+                    # For single page scrape, show a preview
+                    content = scraped.get("plain_text") or ""
+                    preview = content[:150] + ("..." if len(content) > 150 else "")
+                    out.write(f"   Preview: {preview}\n")
+            out.write("\n")
+        
+        # Print analysis summary
+        out.write(format_analysis_summary(results["analysis"]))
+        
+    else:
+        out.write(f"Search failed: {results.get('error', 'Unknown error')}\n")
+    
+    sys.stdout.write(out.getvalue())
+    sys.stdout.flush()
+
+
+def _save_outputs(args: "argparse.Namespace", results: Dict[str, Any]) -> None:
+    """Save results as JSON and/or markdown, or print a truncated JSON summary."""
+    # Save to file if requested
+    if args.output:
+        output_file = args.output
+        if not output_file.endswith('.json'):
+            output_file += '.json'
+        _dump_json(results, output_file, pretty=args.pretty)
+        print(f"Results saved to {output_file}")
+    
+    # Save markdown files if requested
+    if args.markdown_dir:
+        md_dir = pathlib.Path(args.markdown_dir)
+        md_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Render every page first, then write them all as one batch
+        md_files = []
+        
+        # Process each domain result
+        for domain_idx, domain_result in enumerate(results["scraped_content"]):
+            if not domain_result.get("success", False):
+                continue
                 
-            # Add analysis to results
-            analysis = await service.analyze_deep_scrape_results(results)
-            
-            # Print analysis summary
-            print("\n--- Analysis ---")
-            print(f"Total domains scraped: {analysis['summary']['successful_domains']}/{analysis['summary']['total_domains']}")
-            print(f"Total pages crawled: {analysis['summary']['total_pages']}")
-            print(f"Tables found: {analysis['summary']['tables_found']}")
-            
-            # Save option
-            save = input("\nSave results to file? (y/n, default: n): ").lower() == 'y'
-            if save:
-                filename = input("Enter filename (without extension): ") or f"search_{int(datetime.datetime.now().timestamp())}"
-                if not filename.endswith('.json'):
-                    filename += '.json'
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
-                print(f"Results saved to {filename}")
+            # Get pages - either from deep crawl or single page
+            pages = domain_result.get("pages")
+            if pages is None:
+                pages = (domain_result,)
+            
+            for page_idx, page in enumerate(pages):
+                get = page.get
+                if get("success") and get("markdown"):
+                    # Create a safe filename
+                    safe_title = _SAFE_TITLE_STRIP.sub('', get("title", f"result_{domain_idx+1}_{page_idx+1}"))
+                    safe_title = _SAFE_TITLE_DASH.sub('-', safe_title).strip('-')
+                    md_filename = f"d{domain_idx+1:02d}_p{page_idx+1:02d}-{safe_title[:30]}.md"
+                    
+                    md_files.append((md_filename, _render_page_md(page)))
+        
+        if args.markdown_archive:
+            # One file and sequential appends instead of a file per page
+            archive_path = md_dir / "pages.tar"
+            _write_tar(archive_path, md_files)
+            print(f"Markdown pages saved to {archive_path}")
         else:
-            print(f"Search failed: {results.get('error', 'Unknown error')}")
+            _write_batch([(md_dir / md_filename, data) for md_filename, data in md_files])
+            print(f"Markdown files saved to {md_dir}/")
+    
+    if not args.output:
+        # If no output file specified, print full JSON to stdout
+        sys.stdout.write("\n--- Full Results Summary (truncated) ---\n")
+        # Print a truncated version to prevent overwhelming the console
+        summary_results = {
+            "query": results["query"],
+            "success": results["success"],
+            "timestamp": results["timestamp"],
+            # (title, url) pairs; orjson encodes tuples as arrays without per-item dicts
+            "search_results": [(r["title"], r["url"]) for r in results["search_results"]],
+            "analysis": results.get("analysis", {}),
+        }
+        # Write the encoded JSON straight to the byte stream, after flushing
+        # any pending text so the output stays in order
+        sys.stdout.flush()
+        sys.stdout.buffer.write(orjson.dumps(summary_results, option=orjson.OPT_INDENT_2))
+        sys.stdout.buffer.flush()
+        sys.stdout.write("\n\nNote: Full results not shown. Use --output to save complete data.\n")
+        sys.stdout.flush()
+
 
+def _use_uvloop() -> None:
+    """Use uvloop's faster event loop where available (not supported on Windows)."""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
-async def main():
-    """Main function to handle command line arguments or run interactively."""
+
+def main():
+    """Main function to handle command line arguments or run interactively.
+    
+    Only the search and scraping run on the event loop; argument parsing,
+    printing and saving stay synchronous.
+    """
+    import argparse
+    
+    _use_uvloop()
+    
     parser = argparse.ArgumentParser(description="Deep Web Search and Scraper")
     parser.add_argument("--query", "-q", help="Search query")
     parser.add_argument("--domains", "-d", type=int, default=3, help="Number of domains to scrape (default: 3)")
@@ -794,136 +1335,27 @@ async def main():
     parser.add_argument("--no-deep-crawl", action="store_true", help="Disable deep crawling")
     parser.add_argument("--output", "-o", help="Output file (JSON)")
     parser.add_argument("--markdown-dir", "-md", help="Directory to save markdown files")
+    parser.add_argument("--markdown-archive", action="store_true",
+                        help="Save markdown pages into a single pages.tar in --markdown-dir")
+    parser.add_argument("--pretty", action="store_true", help="Write --output as indented JSON (encoded in one piece rather than streamed)")
     parser.add_argument("--interactive", "-i", action="store_true", help="Run in interactive mode")
     
     args = parser.parse_args()
+    if args.markdown_archive and not args.markdown_dir:
+        parser.error("--markdown-archive requires --markdown-dir")
     
     # If no arguments or interactive mode requested, run interactively
     if len(sys.argv) == 1 or args.interactive:
-        await interactive_deep_search()
+        asyncio.run(interactive_deep_search())
         return
     
     # Process command line query
     if args.query:
-        service = DeepScraperService(max_depth=args.depth, max_pages_per_domain=args.max_pages)
-        results = await service.search_and_deep_scrape(
-            args.query, 
-            num_results=args.domains,
-            perform_deep_crawl=not args.no_deep_crawl
-        )
-        
-        # Print a summary
-        print("\n--- Search Results Summary ---")
-        if results["success"]:
-            for i, result in enumerate(results["search_results"]):
-                domain = service.scraper.get_domain(result['url'])
-                scrape_status = "✓" if i < len(results["scraped_content"]) and results["scraped_content"][i]["success"] else "✗"
-                
-                print(f"{i+1}. [{scrape_status}] {result['title']} ({domain})")
-                print(f"   URL: {result['url']}")
-                
-                # Show stats if available
-                if i < len(results["scraped_content"]) and results["scraped_content"][i].get("success"):
-                    if not args.no_deep_crawl:
-                        pages_count = len(results["scraped_content"][i].get("pages", []))
-                        print(f"   Pages crawled: {pages_count}")
-                    else:
-                        # For single page scrape, show a preview
-                        content = results["scraped_content"][i].get("plain_text", "")
-                        preview = content[:150] + "..." if len(content) > 150 else content
-                        print(f"   Preview: {preview}")
-                print()
-            
-            # Add analysis to results
-            analysis = await service.analyze_deep_scrape_results(results)
-            results["analysis"] = analysis
-            
-            # Print analysis summary
-            print("\n--- Deep Scrape Analysis ---")
-            print(f"Total domains scraped: {analysis['summary']['successful_domains']}/{analysis['summary']['total_domains']}")
-            print(f"Total pages crawled: {analysis['summary']['total_pages']}")
-            print(f"Tables found: {analysis['summary']['tables_found']}")
-            print(f"Pages with structured data: {analysis['summary']['structured_data_found']}")
-            
-        else:
-            print(f"Search failed: {results.get('error', 'Unknown error')}")
-            
-        # Save to file if requested
-        if args.output:
-            output_file = args.output
-            if not output_file.endswith('.json'):
-                output_file += '.json'
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            print(f"Results saved to {output_file}")
-        
-        # Save markdown files if requested
-        if args.markdown_dir:
-            os.makedirs(args.markdown_dir, exist_ok=True)
-            
-            # Process each domain result
-            for domain_idx, domain_result in enumerate(results["scraped_content"]):
-                if not domain_result.get("success", False):
-                    continue
-                    
-                # Get pages - either from deep crawl or single page
-                pages = domain_result.get("pages", [domain_result])
-                
-                for page_idx, page in enumerate(pages):
-                    if page.get("success") and page.get("markdown"):
-                        # Create a safe filename
-                        safe_title = re.sub(r'[^\w\s-]', '', page.get("title", f"result_{domain_idx+1}_{page_idx+1}"))
-                        safe_title = re.sub(r'[-\s]+', '-', safe_title).strip('-')
-                        md_filename = f"d{domain_idx+1:02d}_p{page_idx+1:02d}-{safe_title[:30]}.md"
-                        
-                        with open(os.path.join(args.markdown_dir, md_filename), 'w', encoding='utf-8') as md_file:
-                            # Add a header with metadata
-                            md_file.write(f"# {page.get('title', 'Untitled')}\n\n")
-                            md_file.write(f"URL: {page.get('url')}\n\n")
-                            
-                            if page.get("metadata"):
-                                md_file.write(f"Description: {page['metadata'].get('description', '')}\n\n")
-                                
-                            # Add table data if available
-                            if page.get("tables"):
-                                md_file.write(f"## Tables Found ({len(page['tables'])})\n\n")
-                                for table in page["tables"]:
-                                    if table.get("caption"):
-                                        md_file.write(f"### {table['caption']}\n\n")
-                                    else:
-                                        md_file.write(f"### Table {table['id'] + 1}\n\n")
-                                        
-                                    # Create markdown table
-                                    if table["headers"]:
-                                        md_file.write("| " + " | ".join(table["headers"]) + " |\n")
-                                        md_file.write("| " + " | ".join(["---"] * len(table["headers"])) + " |\n")
-                                        
-                                    for row in table["rows"]:
-                                        md_file.write("| " + " | ".join(row) + " |\n")
-                                    
-                                    md_file.write("\n")
-                            
-                            md_file.write("---\n\n")
-                            # Write the markdown content
-                            md_file.write(page["markdown"])
-                            
-            print(f"Markdown files saved to {args.markdown_dir}/")
-        
-        if not args.output:
-            # If no output file specified, print full JSON to stdout
-            print("\n--- Full Results Summary (truncated) ---")
-            # Print a truncated version to prevent overwhelming the console
-            summary_results = {
-                "query": results["query"],
-                "success": results["success"],
-                "timestamp": results["timestamp"],
-                "search_results": [{"title": r["title"], "url": r["url"]} for r in results["search_results"]],
-                "analysis": results.get("analysis", {}),
-            }
-            print(json.dumps(summary_results, ensure_ascii=False, indent=2))
-            print("\nNote: Full results not shown. Use --output to save complete data.")
+        results = asyncio.run(_run_query(args))
+        _render_summary(args, results)
+        _save_outputs(args, results)
     else:
         parser.print_help()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()